@@ -12,15 +12,95 @@ This library requires a separate config.json file for setting the printer's para
 '''
 
 import serial
+import select
+import os
+import atexit
 import logging
 import time
 import json
+import threading
+import queue
+import collections
+import itertools
+import functools
+
+try:
+    import numpy as np
+except ImportError:     # numpy is only needed for moveBatch() and moveArray()
+    np = None
 
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(filename="api_logs.log", level=logging.INFO)
 
 DEFAULT_SPEED = 5000    # mm/min
+BOOT_TIMEOUT = 2        # s, longest wait for the firmware's "start" banner after connecting
+TX_QUEUE_DEPTH = 8      # batches that can wait for room in the printer's RX buffer before the caller blocks
+RX_BUFFER_SIZE = 96     # bytes, used when config.json has no rx_buffer_size. Kept below Marlin's default 128 byte buffer
+
+# Marlin's messages when kill() or stop() halts the firmware. Nothing is acknowledged after these until the board is reset or sent M999.
+# Other "Error:" lines, such as "Error:G2/G3 bad parameters", are followed by a normal "ok".
+_HALT_ERRORS = (b"Error:Printer halted", b"Error:Printer stopped")
+
+# Pre-encoded templates for the move methods. Formatting straight into bytes skips the f-string and the str -> bytes encode.
+# Coordinates are fixed-point: %g switches to exponent notation for small values, and Marlin reads the "e" in "1e-05" as the end of the number.
+_FMT_G0_F = b"G0 F%d\n"
+_FMT_G0_X = b"G0 X%.3f\n"
+_FMT_G0_Y = b"G0 Y%.3f\n"
+_FMT_G0_Z = b"G0 Z%.3f\n"
+_FMT_G0_XY = b"G0 X%.3f Y%.3f\n"
+_FMT_G0_XZ = b"G0 X%.3f Z%.3f\n"
+_FMT_G0_YZ = b"G0 Y%.3f Z%.3f\n"
+_FMT_G0_XYZ = b"G0 X%.3f Y%.3f Z%.3f\n"
+_FMT_G0_X_F = b"G0 X%.3f F%d\n"
+_FMT_G0_Y_F = b"G0 Y%.3f F%d\n"
+_FMT_G0_Z_F = b"G0 Z%.3f F%d\n"
+_FMT_G0_XY_F = b"G0 X%.3f Y%.3f F%d\n"
+_FMT_G0_XZ_F = b"G0 X%.3f Z%.3f F%d\n"
+_FMT_G0_YZ_F = b"G0 Y%.3f Z%.3f F%d\n"
+_FMT_G0_XYZ_F = b"G0 X%.3f Y%.3f Z%.3f F%d\n"
+_FMT_G0_AXIS_F = b"G0 %s%.3f F%d\n"
+_FMT_G2 = b"G2 X%.3f Y%.3f R%.3f\n"
+_FMT_G2_Z = b"G2 X%.3f Y%.3f Z%.3f R%.3f\n"
+_FMT_G3 = b"G3 X%.3f Y%.3f R%.3f\n"
+_FMT_G3_Z = b"G3 X%.3f Y%.3f Z%.3f R%.3f\n"
+
+
+def _axesTable(command: str):
+    '''Maps every combination of X, Y and Z, including none, to the encoded command followed by those axes. Keys are as returned by _axesKey().'''
+    return {
+        "".join(axes): " ".join((command, *axes)).encode("ascii") + b"\n"
+        for n in range(4)
+        for axes in itertools.combinations("XYZ", n)
+    }
+
+
+def _axesKey(axes) -> str:
+    '''Normalizes axes given as a string or any iterable of axis letters, so "YX", "XYX" and {"X", "Y"} all become "XY".'''
+    return "".join(sorted(set(axes)))
+
+
+def _encodeLine(gcode: str):
+    '''
+    Encodes one line of raw gcode, without its ";" comment and surrounding whitespace, ready to queue. Returns None if nothing is left.
+    Marlin sends no "ok" for a blank line and one per line for embedded newlines, either of which would throw off the acknowledgement count.
+    '''
+    line = gcode.strip()
+    if "\n" in line or "\r" in line:
+        raise ValueError(f"Pass one line of gcode at a time: {gcode!r}")
+
+    line = line.split(";", 1)[0].rstrip()
+    if not line:
+        return None
+
+    return line.encode("ascii") + b"\n"
+
+
+@functools.cache
+def _readConfig(path: str):
+    '''Parses a config file. The result is cached per path, so creating more Printers doesn't re-read and re-parse it.'''
+    with open(path, "r") as config_file:
+        return json.load(config_file)
+
 
 class Printer:
     def __init__(self, serial_port):
@@ -32,18 +112,39 @@ class Printer:
         self.ok = None
         self.current_plane = "XY"
         self.current_corrds = [0, 0, 0]
+        self._tx_buf = bytearray()  # encoded gcode lines waiting to be sent as one batch
+        self._tx_lens = []          # byte length of each line in _tx_buf
+        self._inflight = collections.deque()    # byte length of each sent line the printer has not acknowledged yet
+        self._inflight_bytes = 0
+        self._tx_q = collections.deque()        # (batch, lens) ready to send once they fit in the RX buffer
+        self._ack = threading.Condition()       # guards the queues above, notified by the reader thread on every "ok"
+        self._rx_q = queue.Queue()  # lines from the reader thread that aren't acknowledgements or status reports
+        self._error = None          # exception that stopped the reader thread or a failed write, raised by every method waiting on it
+        self._temperature = None    # last temperature report received, kept as bytes until read
 
-        # Attempt to connect to the device upon object initialization
-        connected = self._connect()
+        try:
+            # Attempt to connect to the device upon object initialization
+            connected = self._connect()
+
+            # On successful connection, print machine information and initialize some parameters
+            if connected:
+                self.PRINTER_INFO = self.getPrinterInfo()
+
+                # Set parameters
+                self.speed= DEFAULT_SPEED  # Mutable speed value
+                self._writeBytes(self._SET_ABS)
+                self._writeBytes(_FMT_G0_F % DEFAULT_SPEED)
+                self.flush()
+        except BaseException:
+            # Free the port for a retry, the reader thread exits once it sees the port closed
+            if self.conn is not None:
+                self.conn.close()
+            raise
 
-        # On successful connection, print machine information and initialize some parameters
         if connected:
-            self.PRINTER_INFO = self.getPrinterInfo()
 
-            # Set parameters
-            self.speed= DEFAULT_SPEED  # Mutable speed value
-            self._write(self.GCODE["SET_ABS"])
-            self._write(f"G0 F{DEFAULT_SPEED}")
+            # Commands are only sent in batches, so send whatever a script leaves queued when it exits
+            atexit.register(self.close)
 
 
     '''
@@ -62,41 +163,49 @@ class Printer:
             - Extruder count
             - UUID
         '''
-        response = None
+        # Let earlier commands finish first, an "ok" for G28 can take longer than TIMEOUT, so only the M115 itself is timed
+        self.flush()
 
-        self._write("M115")
+        self._writeBytes(self.GCODE_B["GET_PRT_INFO"])
+        self._sendPending()
+        self.checkOk(self.TIMEOUT)  # a printer that isn't answering raises here instead of hanging the constructor
 
-        while response==None:
-            if self.conn.in_waiting:
-                response = self.conn.readline().decode("utf-8")
-                logger.log(20, f"{response}!")
-                print(f"> {response}")
-            else:
-                time.sleep(0.1)
+        # Skip anything left over from the boot messages
+        response = self._readline()
+        while not response.startswith("FIRMWARE_NAME"):
+            response = self._readline()
+
+        logger.log(logging.INFO, "%s!", response)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("> %s", response)
 
         return response
     
 
-    def checkOk(self):
+    def checkOk(self, timeout: float = None):
         '''
-        WIP. This method will be used to verify that gcode has been executed successfully before proceeding.
+        Blocks until the printer has acknowledged every line sent to it so far.
+        Raises TimeoutError if timeout is given and the printer hasn't acknowledged everything within that many seconds.
         '''
+        with self._ack:
+            done = self._ack.wait_for(lambda: self._error is not None or (not self._inflight and not self._tx_q), timeout)
+            self._raiseError()
 
-        ok_response = False
-        response = None
+            if not done:
+                raise TimeoutError(f"No response from {self.SERIAL_PORT} within {timeout} s.")
 
-        while ok_response==False:
-            if self.conn.in_waiting:
-                response = self.conn.readline().decode("utf-8")
-                print(f"response: {response}")
-                if "ok" in response:
-                    print("Command complete")
-                    ok_response = True
-                    self.ok = ok_response
-                else:
-                    pass
+        self.ok = True
     
 
+    @property
+    def temperature(self):
+        '''The last temperature report from the printer, or None if there hasn't been one. Decoded only when read.'''
+        if self._temperature is None:
+            return None
+
+        return self._temperature.decode("ascii", errors="replace").strip()
+
+
     def getCurrentPos(self):
         # Don't know if this method is really useful if we always work in absolute coords
         pass
@@ -104,59 +213,55 @@ class Printer:
     '''
     MANUAL COMMANDS
     '''
-    def enableMotors(self, motors:str="XYZ"):
+    def enableMotors(self, motors="XYZ"):
         '''Enables specified motors. Specify any combination of X, Y, and/or Z. If no arguments are passed, all motors will be enabled.'''
-        gcode = f"{self.GCODE['ENABLE_MOTORS']}"
+        gcode = self._ENABLE_CMDS.get(_axesKey(motors))
+        if gcode is None:
+            raise ValueError(f"Invalid motor argument in enableMotors(): {motors}")
 
-        for m in motors:
-            if m in "XYZ":
-                gcode += f" {m}"
-            else:
-                raise Exception(f"Invalid motor argument in enableMotors(): {m}")
-
-        self._write(gcode)
+        self._writeBytes(gcode)
 
-        logger.log(20, f"Enabling motors {motors}")
+        logger.log(logging.INFO, "Enabling motors %s", motors)
 
     
-    def disableMotors(self, motors:str="XYZ"):
+    def disableMotors(self, motors="XYZ"):
         '''Disables specified motors. Specify any combination of X, Y, and/or Z. If no arguments are passed, all motors will be disabled.'''
-        gcode = f"{self.GCODE['DISABLE_MOTORS']}"
+        gcode = self._DISABLE_CMDS.get(_axesKey(motors))
+        if gcode is None:
+            raise ValueError(f"Invalid motor argument in disableMotors(): {motors}")
 
-        for m in motors:
-            if m in "XYZ":
-                gcode += f" {m}"
-            else:
-                raise Exception(f"Invalid motor argument in disableMotors(): {m}")
+        self._writeBytes(gcode)
+
+        logger.log(logging.INFO, "Disabling motors %s", motors)
 
-        self._write(gcode)
 
-        logger.log(20, f"Disabling motors {motors}")
+    def release(self):
+        '''
+        Ends a job: sends anything still queued, then disables all motors with a single M84 and waits for it to be acknowledged.
+        Motors stay enabled between commands, so call this once when done with the printer.
+        '''
+        self._writeBytes(self.GCODE_B["DISABLE_MOTORS"])
+        self.flush()
+
+        logger.log(logging.INFO, "Released motors")
+
+        return self
 
 
     '''
     HOMING COMMANDS
     '''
-    def home(self, axes:str="XYZ"):
+    def home(self, axes="XYZ"):
         '''
-        Homes specified axes. Pass a string with up to 3 axes Passing no arguments will home all axes by default.
+        Homes specified axes. Pass a string or any iterable with up to 3 axes, in any order. Passing no arguments will home all axes by default.
         '''
+        gcode = self._HOME_CMDS.get(_axesKey(axes))
+        if gcode is None:
+            raise ValueError(f"Invalid axis argument for auto-home: {axes}")
 
-        gcode = f"{self.GCODE['AUTO_HOME']}"
-
-        for a in axes:
-            print(f"Checking {a}")
-            if a in "XYZ":
-                print(f"{a} in 'XYZ'")
-                gcode += f" {a}"
-            else:
-                raise Exception(f"Invalid axis argument for auto-home: {a}")
-
-        self._write(gcode)
-
-        time.sleep(self.DELAY)
+        self._writeBytes(gcode)
 
-        logger.log(20, f"Homing axis/axes {axes}.")
+        logger.log(logging.INFO, "Homing axis/axes %s.", axes)
         
         return self
 
@@ -171,36 +276,30 @@ class Printer:
 
     def moveX(self, target: float):
         '''Linear move in the X direction.'''
-        if target >= 0 and target < self.LIMITS["X"]:
-            self._write(f"G0 X{target}")
+        if 0 <= target < self._lim_x:
+            self._writeBytes(_FMT_G0_X % target)
         else:
             raise Exception(f"moveX() command exceeds boundary. Target: {target}")
-        
-        time.sleep(self.DELAY)
 
         return self
     
     
     def moveY(self, target: float):
         '''Linear move in the Y direction.'''
-        if target >= 0 and target < self.LIMITS["Y"]:
-            self._write(f"G0 Y{target}")
+        if 0 <= target < self._lim_y:
+            self._writeBytes(_FMT_G0_Y % target)
         else:
             raise Exception(f"moveY() command exceeds boundary. Target: {target}")
-                
-        time.sleep(self.DELAY)
 
         return self
     
     
     def moveZ(self, target: float):
         '''Linear move in the Z direction.'''
-        if target >= 0 and target < self.LIMITS["Z"]:
-            self._write(f"G0 Z{target}")
+        if 0 <= target < self._lim_z:
+            self._writeBytes(_FMT_G0_Z % target)
         else:
             raise Exception(f"moveZ() command exceeds boundary. Target: {target}")
-        
-        time.sleep(self.DELAY)
 
         return self
     
@@ -209,16 +308,12 @@ class Printer:
         '''Linear move diagonally in the XY direction. Pass a list of coordinates in the order (X,Y).'''
 
         if (
-            target[0] >= 0 and 
-            target[1] >= 0 and
-            target[0] < self.LIMITS["X"] and
-            target[1] < self.LIMITS["Y"]
+            0 <= target[0] < self._lim_x and
+            0 <= target[1] < self._lim_y
             ):
-            self._write(f"G0 X{target[0]} Y{target[1]}")
+            self._writeBytes(_FMT_G0_XY % (target[0], target[1]))
         else:
             raise Exception(f"moveXY() command exceeds boundary. Target: {target}")
-                 
-        time.sleep(self.DELAY)
 
         return self
     
@@ -226,16 +321,12 @@ class Printer:
     def moveXZ(self, target: list):
         '''Linear move diagonally in the XZ direction. Pass a list of coordinates in the order (X,Z).'''
         if (
-            target[0] >= 0 and 
-            target[1] >= 0 and
-            target[0] < self.LIMITS["X"] and
-            target[1] < self.LIMITS["Z"]
+            0 <= target[0] < self._lim_x and
+            0 <= target[1] < self._lim_z
             ):
-            self._write(f"G0 X{target[0]} Z{target[1]}")
+            self._writeBytes(_FMT_G0_XZ % (target[0], target[1]))
         else:
             raise Exception(f"moveXZ() command exceeds boundary. Target: {target}")
-        
-        time.sleep(self.DELAY)
 
         return self
     
@@ -243,16 +334,12 @@ class Printer:
     def moveYZ(self, target: list):
         '''Linear move diagonally in the YZ direction. Pass a list of coordinates in the order (Y,Z).'''
         if (
-            target[0] >= 0 and 
-            target[1] >= 0 and
-            target[0] < self.LIMITS["Y"] and
-            target[1] < self.LIMITS["Z"]
+            0 <= target[0] < self._lim_y and
+            0 <= target[1] < self._lim_z
             ):        
-            self._write(f"G0 Y{target[0]} Z{target[1]}")
+            self._writeBytes(_FMT_G0_YZ % (target[0], target[1]))
         else:
             raise Exception(f"moveYZ() command exceeds boundary. Target: {target}")
-                    
-        time.sleep(self.DELAY)
 
         return self
     
@@ -260,18 +347,23 @@ class Printer:
     def move(self, target: list):
         '''General linear move command. Pass a list of coordinates in the order (X,Y,Z).'''
         if (
-            target[0] >= 0 and 
-            target[1] >= 0 and
-            target[2] >= 0 and
-            target[0] < self.LIMITS["X"] and
-            target[1] < self.LIMITS["Y"] and
-            target[2] < self.LIMITS["Z"]
+            0 <= target[0] < self._lim_x and
+            0 <= target[1] < self._lim_y and
+            0 <= target[2] < self._lim_z
             ):        
-            self._write(f"G0 X{target[0]} Y{target[1]} Z{target[2]}")
+            self._writeBytes(_FMT_G0_XYZ % (target[0], target[1], target[2]))
         else:
             raise Exception(f"move() command exceeds boundary. Target: {target}")
-                    
-        time.sleep(self.DELAY)
+
+        return self
+    
+
+    def moveBatch(self, points):
+        '''
+        Linear moves through a sequence of points. Pass an array of shape (N, 3) with coordinates in the order (X,Y,Z).
+        Every point is bounds-checked in one vectorized comparison before anything is queued. Requires numpy.
+        '''
+        self._writePoints(self._checkPoints(points, "moveBatch"))
 
         return self
     
@@ -282,56 +374,63 @@ class Printer:
 
     def moveSpeedX(self, target: float, speed: int):
         '''Linear move in the X direction with a speed parameter.'''
-        self._write(f"G0 X{target} F{speed}")
-        time.sleep(self.DELAY)
+        self._writeBytes(_FMT_G0_X_F % (target, speed))
 
         return self
     
 
     def moveSpeedY(self, target: float, speed: int):
         '''Linear move in the Y direction with a speed parameter.'''
-        self._write(f"G0 Y{target} F{speed}")
-        time.sleep(self.DELAY)
+        self._writeBytes(_FMT_G0_Y_F % (target, speed))
 
         return self
     
 
     def moveSpeedZ(self, target: float, speed: int):
         '''Linear move in the Z direction with a speed parameter.'''
-        self._write(f"G0 Z{target} F{speed}")
-        time.sleep(self.DELAY)
+        self._writeBytes(_FMT_G0_Z_F % (target, speed))
 
         return self
     
 
     def moveSpeedXY(self, target: tuple, speed: int):
         '''Linear move in the XY direction with a speed parameter. Pass a tuple of coordinates in the order (X,Y).'''
-        self._write(f"G0 X{target} Y{target} F{speed}")
-        time.sleep(self.DELAY)
+        self._writeBytes(_FMT_G0_XY_F % (target[0], target[1], speed))
 
         return self
     
 
     def moveSpeedXZ(self, target: tuple, speed: int):
         '''Linear move in the XZ direction with a speed parameter. Pass a tuple of coordinates in the order (X,Z).'''
-        self._write(f"G0 X{target} Z{target} F{speed}")
-        time.sleep(self.DELAY)
+        self._writeBytes(_FMT_G0_XZ_F % (target[0], target[1], speed))
 
         return self
     
 
     def moveSpeedYZ(self, target: tuple, speed: int):
         '''Linear move in the YZ direction with a speed parameter. Pass a tuple of coordinates in the order (Y,Z).'''
-        self._write(f"G0 Y{target} Z{target} F{speed}")
-        time.sleep(self.DELAY)
+        self._writeBytes(_FMT_G0_YZ_F % (target[0], target[1], speed))
 
         return self
     
 
     def moveSpeed(self, target: tuple, speed: int):
         '''General linear move with a speed parameter. Pass a tuple of coordinates in the order (X,Y,Z).'''
-        self._write(f"G0 X{target[0]} Y{target[1]} Z{target[2]} F{speed}")
-        time.sleep(self.DELAY)
+        self._writeBytes(_FMT_G0_XYZ_F % (target[0], target[1], target[2], speed))
+
+        return self
+
+
+    def moveArray(self, xyz, speed: int):
+        '''
+        Linear moves through a sequence of points at one speed. Pass an array of shape (N, 3) with coordinates in the order (X,Y,Z).
+        Like moveBatch(), but the speed is set once on the first move and applies to the rest. Requires numpy.
+        '''
+        points = self._checkPoints(xyz, "moveArray")
+
+        if len(points):
+            self._writeBytes(_FMT_G0_XYZ_F % (*points[0].tolist(), speed))
+            self._writePoints(points[1:])
 
         return self
     
@@ -345,39 +444,33 @@ class Printer:
 
     def relMoveX(self, dist, speed=DEFAULT_SPEED):
         '''Performs a linear move in the X direction with relative positioning, then reverts back to absolute positioning.'''
-        self._write(self.GCODE["SET_REL"])
-        self._write(f"G0 X{dist} F{speed}")
-        self._write(self.GCODE["SET_ABS"])
+        self._writeBytes(self._SET_REL)
+        self._writeBytes(_FMT_G0_X_F % (dist, speed))
+        self._writeBytes(self._SET_ABS)
 
-        time.sleep(self.DELAY)
-
-        logger.log(20, f"Linear relative X move, dist {dist}, speed {speed}")
+        logger.debug("Linear relative X move, dist %s, speed %s", dist, speed)
 
         return self
 
 
     def relMoveY(self, dist, speed=DEFAULT_SPEED):
-        '''Performs a linear move in the X direction with relative positioning, then reverts back to absolute positioning.'''
-        self._write(self.GCODE["SET_REL"])
-        self._write(f"G0 Y{dist} F{speed}")
-        self._write(self.GCODE["SET_ABS"])
-
-        time.sleep(self.DELAY)
+        '''Performs a linear move in the Y direction with relative positioning, then reverts back to absolute positioning.'''
+        self._writeBytes(self._SET_REL)
+        self._writeBytes(_FMT_G0_Y_F % (dist, speed))
+        self._writeBytes(self._SET_ABS)
 
-        logger.log(20, f"Linear relative Y move, dist {dist}, speed {speed}")
+        logger.debug("Linear relative Y move, dist %s, speed %s", dist, speed)
 
         return self
 
 
     def relMoveZ(self, dist, speed=DEFAULT_SPEED):
-        '''Performs a linear move in the X direction with relative positioning, then reverts back to absolute positioning.'''
-        self._write(self.GCODE["SET_REL"])
-        self._write(f"G0 Z{dist} F{speed}")
-        self._write(self.GCODE["SET_ABS"])
-
-        time.sleep(self.DELAY)
+        '''Performs a linear move in the Z direction with relative positioning, then reverts back to absolute positioning.'''
+        self._writeBytes(self._SET_REL)
+        self._writeBytes(_FMT_G0_Z_F % (dist, speed))
+        self._writeBytes(self._SET_ABS)
 
-        logger.log(20, f"Linear relative Z move, dist {dist}, speed {speed}")
+        logger.debug("Linear relative Z move, dist %s, speed %s", dist, speed)
 
         return self
     
@@ -395,24 +488,22 @@ class Printer:
 
     Movements such as arcs and circles. It seems like Prusa's Buddy firmware doesn't support G17/G18/G19.
     '''
-    def moveArcCW(self, radius:float, x:float, y:float, z:float = -1):
-        match (z):
-            case (-1):
-                self._write(f"G2 X{x} Y{y} R{radius}")
-            case _:
-                self._write(f"G2 X{x} Y{y} Z{z} R{radius}")
-        time.sleep(self.DELAY)
+    def moveArcCW(self, radius:float, x:float, y:float, z:float = None):
+        '''Clockwise arc to (x, y) with the given radius. Pass z to also move in Z along the arc.'''
+        if z is None:
+            self._writeBytes(_FMT_G2 % (x, y, radius))
+        else:
+            self._writeBytes(_FMT_G2_Z % (x, y, z, radius))
 
         return self
     
 
-    def moveArcCCW(self, radius:float, x:float, y:float, z:float = -1):
-        match (z):
-            case (-1):
-                self._write(f"G3 X{x} Y{y} R{radius}")
-            case _:
-                self._write(f"G3 X{x} Y{y} Z{z} R{radius}")
-        time.sleep(self.DELAY)
+    def moveArcCCW(self, radius:float, x:float, y:float, z:float = None):
+        '''Counter-clockwise arc to (x, y) with the given radius. Pass z to also move in Z along the arc.'''
+        if z is None:
+            self._writeBytes(_FMT_G3 % (x, y, radius))
+        else:
+            self._writeBytes(_FMT_G3_Z % (x, y, z, radius))
 
         return self
     
@@ -424,11 +515,10 @@ class Printer:
     '''
     def linearHop(self, height: float, dist: float, direction: str, speed=DEFAULT_SPEED):
         '''Perform a hop move using only linear motions.'''
-        rise = f"G0 Z{height} F{speed}"
-        move_xy = f"G0 {direction}{dist} F{speed}"
-        lower = f"G0 Z{-height} F{speed}"
-
-        self._write(f"{rise}\n{move_xy}\n{lower}")
+        # Queued as three lines rather than one multi-line string so each of them is counted for the printer's acknowledgements
+        self._writeBytes(_FMT_G0_Z_F % (height, speed))
+        self._writeBytes(_FMT_G0_AXIS_F % (direction.encode("ascii"), dist, speed))
+        self._writeBytes(_FMT_G0_Z_F % (-height, speed))
 
         return self
 
@@ -436,14 +526,102 @@ class Printer:
     '''
     UTILITY FUNCTIONS
     '''
-    def setSpeed(self, speed:float):
-        '''Sets movement speed. Pass a value in mm/s and this function will convert to mm/min for the printer to understand.'''
-        
+    def flush(self):
+        '''
+        Sends all queued gcode to the printer and waits for every line to be acknowledged.
+        Commands are queued until BATCH_SIZE lines are pending, so call this at the end of a chain to execute the rest.
+        '''
+        self._sendPending()
+        self.checkOk()
+
+        return self
+
+
+    def waitForMoves(self):
+        '''
+        Blocks until the printer has finished every queued move. flush() returns once the moves are in the printer's planner,
+        this sends M400 as well, which Marlin only acknowledges after the planner is empty and the motors have stopped.
+        '''
+        self._writeBytes(self.GCODE_B["WAIT_FOR_MOVES"])
+        self.flush()
+
+        return self
+
+
+    def close(self):
+        '''
+        Sends anything still queued, waits for it to be acknowledged and closes the serial port.
+        Called automatically when the script exits, but can be called earlier to free the port.
+        '''
+        if self.conn is None or not self.conn.is_open:
+            return
+
+        try:
+            self.flush()
+        finally:
+            atexit.unregister(self.close)
+            self.conn.close()
+
+        logger.log(logging.INFO, "Closed connection to %s.", self.SERIAL_PORT)
+
+
+    def submit(self, gcode: str):
+        '''
+        Queues one line of gcode without waiting for it. Lines are sent in batches of up to BATCH_SIZE, one write per batch,
+        and flush() sends whatever is left and waits for every "ok". Comments are stripped and blank lines are skipped.
+        '''
+        self._write(gcode)
+
+        return self
+
+
+    def submitMany(self, gcode_list: list):
+        '''Queues a list of gcode lines without waiting for them, same as calling submit() on each one. Accepts the lines of a gcode file as read.'''
+        write = self._writeBytes
+        for gcode in gcode_list:
+            line = _encodeLine(gcode)
+            if line is not None:
+                write(line)
+
+        return self
+
+
+    def batchWrite(self, gcode: str, n: int):
+        '''
+        Queues the same line of gcode n times, for example a relative move repeated along a raster.
+        The line is encoded once and the copies are added to the batch in bulk rather than one call per line.
+        '''
+        line = _encodeLine(gcode)
+        if line is None:
+            return self
+
+        size = len(line)
+
+        while n > 0:
+            room = min(self.BATCH_SIZE - len(self._tx_lens), (self.RX_BUFFER_SIZE - len(self._tx_buf)) // size)
+            if room < 1:
+                if self._tx_lens:
+                    self._sendPending()
+                    continue
+                room = 1
 
-        mms_to_mmmin = round(speed*60.0, 2)
-        self._write(f"G0 F{mms_to_mmmin}")
+            count = min(room, n)
+            self._tx_buf += line * count
+            self._tx_lens += [size] * count
+            n -= count
+
+        if len(self._tx_lens) >= self.BATCH_SIZE:
+            self._sendPending()
+
+        return self
+
+
+    def setSpeed(self, speed:float):
+        '''Sets movement speed. Pass a value in mm/s and this function will convert to a whole number of mm/min for the printer to understand.'''
+        mms_to_mmmin = round(speed*60.0)
+        self._writeBytes(_FMT_G0_F % mms_to_mmmin)
         self.speed = mms_to_mmmin
-        logger.log(20, f"Speed set to {speed} mm/s.")
+        logger.log(logging.INFO, "Speed set to %s mm/s.", speed)
 
         return self
 
@@ -452,9 +630,9 @@ class Printer:
         '''Set either relative ("rel") or absolute ("abs") coordinates. By default, set to absolute.'''
         match mode:
             case "rel":
-                self._write(self.GCODE["SET_REL"])
+                self._writeBytes(self._SET_REL)
             case "abs":
-                self._write(self.GCODE["SET_ABS"])
+                self._writeBytes(self._SET_ABS)
             case _:
                 raise Exception(f"Invalid mode {mode}. Valid parameters are either 'rel' or 'abs'.")
 
@@ -463,27 +641,24 @@ class Printer:
 
     def setXYPlane(self):
         '''Sets workspace plane to the XY plane. Allows G2, G3, G5 to operate in this plane.'''
-        self._write(self.GCODE["SET_XY_PLANE"])
+        self._writeBytes(self._SET_XY_PLANE)
         self.current_plane = "XY"
-        time.sleep(self.DELAY)
 
         return self
 
 
     def setZXPlane(self):
         '''Sets workspace plane to the ZX plane using G18. Allows G2, G3, G5 to operate in this plane.'''
-        self._write(self.GCODE["SET_ZX_PLANE"])
+        self._writeBytes(self._SET_ZX_PLANE)
         self.current_plane = "ZX"
-        time.sleep(self.DELAY)
 
         return self
 
 
     def setYZPlane(self):
         '''Sets workspace plane to the YZ plane. Allows G2, G3, G5 to operate in this plane.'''
-        self._write(self.GCODE["SET_YZ_PLANE"])
+        self._writeBytes(self._SET_YZ_PLANE)
         self.current_plane = "YZ"
-        time.sleep(self.DELAY)
 
         return self
 
@@ -499,59 +674,355 @@ class Printer:
     def _loadConfig(self):
         '''Load parameters defined in the config.json file.'''
         try:
-            with open("config.json", "r") as config_file:
-                config = json.load(config_file)
-                
-            # Constants
-            self.BAUDRATE = config["serial_settings"]["baudrate"]
-            self.TIMEOUT = config["serial_settings"]["timeout"]
-
-            self.DELAY = config["run_params"]["delay"]
-            self.STEPS = config["run_params"]["steps"]
-            self.RESOLUTION = config["run_params"]["resolution"]
-            self.BATCH_SIZE = config["run_params"]["batch_size"]
-            self.COORD_DEADBAND = config["run_params"]["coord_deadband"]
-
-            self.GCODE = config["gcode"]    # Store the whole dictionary in this property
-
-            # Define printer parameters
-            self.LIMITS = {
-                "X": config["printer_params"]["soft_limits"]["x"],
-                "Y": config["printer_params"]["soft_limits"]["y"],
-                "Z": config["printer_params"]["soft_limits"]["z"]
-            }
-
-            config_file.close()     # Close the config file after reading from it
-        except:
+            config = _readConfig(os.path.abspath("config.json"))
+        except FileNotFoundError:
             print("Could not find config.json.")
-            exit()
+            raise
+
+        # Constants
+        self.BAUDRATE = config["serial_settings"]["baudrate"]
+        self.TIMEOUT = config["serial_settings"]["timeout"]
+
+        self.DELAY = config["run_params"]["delay"]
+        self.STEPS = config["run_params"]["steps"]
+        self.RESOLUTION = config["run_params"]["resolution"]
+        self.BATCH_SIZE = config["run_params"]["batch_size"]
+        self.RX_BUFFER_SIZE = config["run_params"].get("rx_buffer_size", RX_BUFFER_SIZE)
+        self.COORD_DEADBAND = config["run_params"]["coord_deadband"]
+
+        self.GCODE = dict(config["gcode"])    # Store the whole dictionary in this property, copied since the parsed config is shared
+        self.GCODE.setdefault("WAIT_FOR_MOVES", "M400")     # Added after the first config.json files were written
+
+        # The same table encoded once as ready-to-send lines, so fixed commands never go through an encode
+        self.GCODE_B = {name: gcode.encode("ascii") + b"\n" for name, gcode in self.GCODE.items()}
+
+        # Commands sent from the move methods get their own attributes to skip the dict lookup as well
+        self._SET_REL = self.GCODE_B["SET_REL"]
+        self._SET_ABS = self.GCODE_B["SET_ABS"]
+
+        self._SET_XY_PLANE = self.GCODE_B["SET_XY_PLANE"]
+        self._SET_ZX_PLANE = self.GCODE_B["SET_ZX_PLANE"]
+        self._SET_YZ_PLANE = self.GCODE_B["SET_YZ_PLANE"]
+
+        # Every normalized axes argument to home(), enableMotors() and disableMotors() mapped to its encoded command
+        self._HOME_CMDS = _axesTable(self.GCODE["AUTO_HOME"])
+        self._ENABLE_CMDS = _axesTable(self.GCODE["ENABLE_MOTORS"])
+        self._DISABLE_CMDS = _axesTable(self.GCODE["DISABLE_MOTORS"])
+
+        # Define printer parameters
+        self.LIMITS = {
+            "X": config["printer_params"]["soft_limits"]["x"],
+            "Y": config["printer_params"]["soft_limits"]["y"],
+            "Z": config["printer_params"]["soft_limits"]["z"]
+        }
+
+        # Plain float copies of the limits for the bounds checks in the move methods
+        self._lim_x = float(self.LIMITS["X"])
+        self._lim_y = float(self.LIMITS["Y"])
+        self._lim_z = float(self.LIMITS["Z"])
+
+        if np is not None:
+            self._limits_vec = np.array([self._lim_x, self._lim_y, self._lim_z])
 
 
     def _connect(self):
         print(f"Connecting to {self.SERIAL_PORT}")
         try:
-            self.conn = serial.Serial(self.SERIAL_PORT, self.BAUDRATE, self.TIMEOUT)
-            time.sleep(2)
-        except Exception as e:
-            print("Could not connect")
-            logger.log(20, "Could not connect to serial device.")
-            exit()
+            # Writes go straight to the non-blocking fd in _send(), write_timeout=0 keeps conn.write() non-blocking as well
+            self.conn = serial.Serial(self.SERIAL_PORT, self.BAUDRATE, timeout=self.TIMEOUT, write_timeout=0)
+        except (serial.SerialException, OSError) as e:
+            logger.log(logging.INFO, "Could not connect to serial device.")
+            raise ConnectionError(f"Could not connect to {self.SERIAL_PORT}") from e
+
+        self._fd = self._pollableFd()
+        if self._fd is None:
+            # No fd to wait on (Windows), so reads and writes go through pyserial and its timeouts instead
+            self.conn.write_timeout = self.TIMEOUT
+            logger.log(logging.INFO, "Serial port has no pollable fd, using pyserial reads and writes.")
 
         if self.conn:
-            logger.log(20, f"Successfully connected to serial device {self.SERIAL_PORT}!")
+            logger.log(logging.INFO, "Successfully connected to serial device %s!", self.SERIAL_PORT)
             print("Connection successful!")
 
+            # Responses are read on a separate thread so gcode can be formatted and sent while the printer is replying
+            self._rx_thread = threading.Thread(target=self._rxLoop, daemon=True)
+            self._rx_thread.start()
+
+            self._waitForStart()
+
         return True
 
 
+    def _pollableFd(self):
+        '''
+        Returns the serial port's fd for select(), or None where that isn't possible.
+        select() only takes sockets on Windows, and select.poll() is avoided because macOS doesn't support it on tty devices.
+        '''
+        if os.name != "posix":
+            return None
+
+        try:
+            return self.conn.fileno()
+        except (AttributeError, OSError):  # io.UnsupportedOperation is an OSError
+            return None
+
+
+    def _waitForStart(self):
+        '''
+        Opening the port resets most Marlin boards, which then print "start" once the firmware is ready for commands.
+        Returns as soon as the banner arrives, or after BOOT_TIMEOUT for boards that don't reset on connect.
+        '''
+        deadline = time.monotonic() + BOOT_TIMEOUT
+
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                line = self._rx_q.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            if line is None:
+                self._raiseError()
+
+            if line.startswith(b"start"):
+                return True
+
+        logger.log(logging.INFO, "No start banner received, continuing.")
+        return False
+
+
+    def _rxLoop(self):
+        '''
+        Runs on the reader thread. Reads every line the printer sends. Acknowledgements release their line's bytes from the in-flight
+        count, temperature reports update self._temperature, and everything else goes on the receive queue.
+        The thread sleeps in select() on the serial fd until the printer sends something, then takes everything waiting in one os.read().
+        Without a pollable fd it blocks in pyserial's read() instead, which returns after TIMEOUT if nothing arrives.
+        If the port fails or the printer reports an error, the exception is stored in self._error and every waiting method is woken to raise it.
+        '''
+        try:
+            self._readLoop()
+        except Exception as e:     # anything that ends this loop would otherwise leave the waiting methods blocked forever
+            if not self.conn.is_open:
+                return  # closed by close()
+
+            logger.error("Reader thread stopped: %s", e)
+
+            with self._ack:
+                if self._error is None:
+                    self._error = e
+                self._ack.notify_all()
+
+            self._rx_q.put(None)    # wakes _readline()
+
+
+    def _readLoop(self):
+        '''Reads and dispatches lines until the port is closed. See _rxLoop().'''
+        received = bytearray()
+
+        while self.conn.is_open:
+            if self._fd is None:
+                chunk = self.conn.read(self.conn.in_waiting or 1)
+                if not chunk:
+                    continue
+            else:
+                readable, _, _ = select.select([self._fd], [], [], self.TIMEOUT)
+                if not readable or not self.conn.is_open:
+                    continue    # once closed, the fd number may already belong to a newer connection
+
+                try:
+                    chunk = os.read(self._fd, 4096)
+                except BlockingIOError:
+                    continue
+
+                if not chunk:
+                    raise serial.SerialException(f"{self.SERIAL_PORT} was disconnected.")
+
+            received += chunk
+
+            while (end := received.find(b"\n")) >= 0:
+                line = bytes(received[:end + 1])
+                del received[:end + 1]
+
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("response: %s", line)
+
+                if line.startswith(b"ok"):
+                    with self._ack:
+                        if self._inflight:
+                            self._inflight_bytes -= self._inflight.popleft()
+                        self._pumpTx()
+                        self._ack.notify_all()
+                elif line.startswith(b"echo:busy"):
+                    pass    # keepalive sent during long commands such as homing
+                elif line.startswith((b"T:", b" T:")):
+                    self._temperature = line
+                elif line.startswith(_HALT_ERRORS):
+                    raise RuntimeError(f"Printer reported {line.decode('ascii', errors='replace').strip()}")
+                elif line.startswith(b"Error:"):
+                    logger.error("Printer reported %s", line)
+                elif line.startswith((b"echo:", b"Resend:", b"Cap:")):
+                    logger.log(logging.INFO, "%s", line)    # informational only, nothing reads these back
+                else:
+                    self._rx_q.put(line)
+
+
+    def _readline(self):
+        '''
+        Blocks until the reader thread has received a line from the printer and returns it decoded.
+        Raises TimeoutError if nothing arrives within the configured serial timeout.
+        '''
+        self._raiseError()
+
+        try:
+            line = self._rx_q.get(timeout=self.TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError(f"No response from {self.SERIAL_PORT} within {self.TIMEOUT} s.") from None
+
+        if line is None:
+            self._raiseError()
+
+        return line.decode("ascii", errors="replace")
+
+
+    def _raiseError(self):
+        '''Raises the exception that stopped the reader thread or a write, if any. Nothing will be acknowledged after that, so waiting would hang.'''
+        if self._error is not None:
+            raise self._error
+
+
+    def _checkPoints(self, points, caller: str):
+        '''Converts a sequence of (X,Y,Z) points to an (N, 3) float array and bounds-checks every point in one vectorized comparison.'''
+        if np is None:
+            raise ImportError(f"{caller}() requires numpy.")
+
+        points = np.asarray(points, dtype=float)
+
+        if points.ndim != 2 or points.shape[1] != 3:
+            raise Exception(f"{caller}() expects an array of shape (N, 3). Got shape: {points.shape}")
+
+        # Written as "not inside" so NaN fails the check, the same as in the scalar move methods
+        out_of_bounds = ~((points >= 0) & (points < self._limits_vec)).all(axis=1)
+        if out_of_bounds.any():
+            raise Exception(f"{caller}() command exceeds boundary. Target: {points[out_of_bounds][0].tolist()}")
+
+        return points
+
+
+    def _writePoints(self, points):
+        '''Queues a G0 move to each point of an (N, 3) array.'''
+        # Format the whole toolpath with a single bytes % call, then queue it line by line for batching and flow control
+        gcode = (_FMT_G0_XYZ * len(points)) % tuple(points.ravel().tolist())
+
+        write = self._writeBytes
+        for line in gcode.splitlines(keepends=True):
+            write(line)
+
+
     def _write(self, gcode):
-        '''Writes string of gcode to the printer via serial port. Adds a newline character at the end to execute the command.'''
-        gcode += "\n"
-        gcode_to_bytes = gcode.encode("utf-8")
-        print(f"Writing gcode {gcode_to_bytes}")
-        self.conn.write(gcode_to_bytes)
-        self.conn.write(b'M84\n')
+        '''
+        Queues a string of gcode to be sent to the printer. Adds a newline character at the end to execute the command.
+        Only for commands built at runtime, fixed commands are queued from GCODE_B with _writeBytes().
+        '''
+        line = _encodeLine(gcode)
+        if line is not None:
+            self._writeBytes(line)
+
+
+    def _writeBytes(self, line: bytes):
+        '''
+        Queues an encoded, newline-terminated line of gcode to be sent to the printer.
+        The queue is flushed once it holds BATCH_SIZE lines, and before it would overflow the printer's serial RX buffer.
+        '''
+        if len(self._tx_buf) + len(line) > self.RX_BUFFER_SIZE:
+            self._sendPending()
+
+        self._tx_buf += line
+        self._tx_lens.append(len(line))
+
+        if len(self._tx_lens) >= self.BATCH_SIZE:
+            self._sendPending()
+
+
+    def _sendPending(self):
+        '''Sends the queued lines as one batch without waiting for them to be acknowledged.'''
+        if self._tx_lens:
+            # Swap in a fresh buffer rather than clearing this one, _send() may still hold a view of it
+            batch, lens = self._tx_buf, self._tx_lens
+            self._tx_buf = bytearray()
+            self._tx_lens = []
+
+            self._queueWrite(batch, lens)
+
+
+    def _queueWrite(self, batch: bytes, lens: list):
+        '''
+        Hands a batch of newline-terminated gcode lines over to be sent in a single write. lens holds the byte length of each line.
+        The batch waits in the send queue until it fits in the printer's RX buffer. The caller only blocks once TX_QUEUE_DEPTH batches
+        are waiting, so it can keep building the next batches while the reader thread sends these as the printer acknowledges.
+        '''
+        with self._ack:
+            self._ack.wait_for(lambda: self._error is not None or len(self._tx_q) < TX_QUEUE_DEPTH)
+            self._raiseError()
+            self._tx_q.append((batch, lens))
+            self._pumpTx()
+
+
+    def _pumpTx(self):
+        '''
+        Sends queued batches, oldest first, while the next one fits in what is left of the printer's RX buffer.
+        Marlin answers each line with "ok" once it has taken it off its RX buffer, so the bytes sent but not yet acknowledged are
+        counted and the buffer is topped up without ever overflowing. Must be called with self._ack held.
+        A failed write is stored in self._error and raised, so the next flush() raises it too instead of waiting for acknowledgements.
+        '''
+        while self._tx_q:
+            batch, lens = self._tx_q[0]
+            if self._inflight and self._inflight_bytes + len(batch) > self.RX_BUFFER_SIZE:
+                break
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Writing gcode %s", batch)
+
+            try:
+                self._send(batch)
+            except OSError as e:
+                # Part of the batch may have reached the printer, so the acknowledgements can't be matched to lines anymore
+                self._error = e
+                self._ack.notify_all()
+                raise
+
+            # Only counted once written, acknowledgements will never arrive for a batch that wasn't
+            self._tx_q.popleft()
+            self._inflight.extend(lens)
+            self._inflight_bytes += len(batch)
+
+
+    def _send(self, data: bytes):
+        '''
+        Writes bytes to the serial port without blocking the whole process when the printer stops reading.
+        The port's fd is non-blocking, so os.write() returns how much the OS accepted. The rest is retried once select() reports the port writable.
+        Raises serial.SerialTimeoutException if the port accepts nothing for TIMEOUT seconds, rather than hanging on a stuck printer.
+        This bypasses pyserial's write() and its argument checks, so only pass bytes-like data.
+        Without a pollable fd this falls back to pyserial's write(), which raises the same exception after its write_timeout.
+        '''
+        if self._fd is None:
+            self.conn.write(data)
+            return
+
+        view = memoryview(data)
+        deadline = time.monotonic() + self.TIMEOUT
+
+        while view:
+            try:
+                written = os.write(self._fd, view)
+            except BlockingIOError:
+                written = 0
+
+            view = view[written:]
+            if not view:
+                break
 
+            if written:
+                deadline = time.monotonic() + self.TIMEOUT
+            elif time.monotonic() > deadline:
+                raise serial.SerialTimeoutException(f"Write timeout on {self.SERIAL_PORT}")
 
-    def _queueWrite(sef, gcode_list: list):
-        pass
\ No newline at end of file
+            select.select([], [self._fd], [], 0.01)
\ No newline at end of file
@@ -1,5 +1,6 @@
 import serial
-import time
+import logging
+import os
 from python_gcode_api import Printer
 import readline
 
@@ -21,15 +22,15 @@ def runTerminal():
     try: 
         p = Printer("/dev/ttyACM0")
         print("Connected successfully!")
-    except:
-        print("Error connecting to printer")
-
-    time.sleep(2)
+    except ConnectionError as e:
+        print(f"Error connecting to printer: {e.__cause__}")
+        return
 
     while True:
         cmd = input("> Enter a command.\n> ")
         try:
             result = eval(cmd)
+            p.flush()
             print(f"> Executed {cmd}")
         except ValueError:
             print("Invalid argument")
@@ -39,6 +40,8 @@ def runTerminal():
 
 
 def main():
+    # Set PRINTER_LOG_LEVEL=WARNING to skip the per-command log entries on long runs
+    logging.basicConfig(filename="api_logs.log", level=os.environ.get("PRINTER_LOG_LEVEL", "INFO").upper())
     setupReadline()
     runTerminal()
 
@@ -1,4 +1,6 @@
 import time
+import logging
+import os
 import serial
 from python_gcode_api import Printer
 import asyncio
@@ -13,11 +15,18 @@ def test_motion(p: Printer):
     p.setZXPlane()
     p.moveArcCW(40, 100, 60)
     p.moveArcCW(40, 140, 20)
-    p.disableMotors()
+    p.release()
 
 
 def main():
-    p = Printer("/dev/ttyACM0")
+    # Set PRINTER_LOG_LEVEL=WARNING to skip the per-command log entries on long runs
+    logging.basicConfig(filename="api_logs.log", level=os.environ.get("PRINTER_LOG_LEVEL", "INFO").upper())
+    try:
+        p = Printer("/dev/ttyACM0")
+    except ConnectionError as e:
+        print(f"Error connecting to printer: {e.__cause__}")
+        return
+
     test_motion(p)
     # pass
 